@@ -80,6 +80,13 @@ jinja = {
 after_install = "hrms.install.after_install"
 after_migrate = "hrms.setup.update_select_perm_after_install"
 
+# Cache
+# -----
+
+clear_cache = (
+	"hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment.clear_leave_details_cache"
+)
+
 # Uninstallation
 # ------------
 
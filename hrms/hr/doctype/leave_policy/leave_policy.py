@@ -6,6 +6,10 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 
+from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
+	clear_leave_policy_details_cache,
+)
+
 
 class LeavePolicy(Document):
 	def validate(self):
@@ -20,3 +24,9 @@ class LeavePolicy(Document):
 							lp_detail.leave_type, max_leaves_allowed
 						)
 					)
+
+	def on_change(self):
+		clear_leave_policy_details_cache(self.name)
+
+	def on_trash(self):
+		clear_leave_policy_details_cache(self.name)
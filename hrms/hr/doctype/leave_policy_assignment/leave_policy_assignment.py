@@ -3,22 +3,19 @@
 
 
 import json
+from functools import partial
 from math import ceil
 
 import frappe
 from frappe import _, bold
 from frappe.model.document import Document
-from frappe.utils import (
-	add_months,
-	cint,
-	date_diff,
-	flt,
-	formatdate,
-	get_first_day,
-	get_last_day,
-	get_link_to_form,
-	getdate,
-)
+from frappe.model.meta import get_field_precision
+from frappe.utils import add_months, flt, formatdate, get_last_day, get_link_to_form, getdate
+
+from hrms.hr.utils import calculate_pro_rated_leaves, get_monthly_earned_leave
+
+# number of assignments submitted between commits while assigning policies in bulk
+BULK_ASSIGNMENT_COMMIT_BATCH_SIZE = 100
 
 
 class LeavePolicyAssignment(Document):
@@ -36,12 +33,19 @@ class LeavePolicyAssignment(Document):
 				"Leave Period", self.leave_period, ["from_date", "to_date"]
 			)
 		elif self.assignment_based_on == "Joining Date":
-			self.effective_from = frappe.db.get_value("Employee", self.employee, "date_of_joining")
+			self.effective_from = self.get_date_of_joining()
 
 	def validate_policy_assignment_overlap(self):
-		leave_policy_assignments = frappe.get_all(
+		# overlaps are checked upfront for all employees in a bulk assignment
+		employee_details = self.get_prefetched_employee_details()
+		if employee_details and employee_details.has_overlap is not None:
+			if employee_details.has_overlap:
+				self.throw_overlap_error()
+			return
+
+		overlapping_assignment = frappe.db.exists(
 			"Leave Policy Assignment",
-			filters={
+			{
 				"employee": self.employee,
 				"name": ("!=", self.name),
 				"docstatus": 1,
@@ -50,25 +54,27 @@ class LeavePolicyAssignment(Document):
 			},
 		)
 
-		if len(leave_policy_assignments):
-			frappe.throw(
-				_("Leave Policy: {0} already assigned for Employee {1} for period {2} to {3}").format(
-					bold(self.leave_policy),
-					bold(self.employee),
-					bold(formatdate(self.effective_from)),
-					bold(formatdate(self.effective_to)),
-				)
+		if overlapping_assignment:
+			self.throw_overlap_error()
+
+	def throw_overlap_error(self):
+		frappe.throw(
+			_("Leave Policy: {0} already assigned for Employee {1} for period {2} to {3}").format(
+				bold(self.leave_policy),
+				bold(self.employee),
+				bold(formatdate(self.effective_from)),
+				bold(formatdate(self.effective_to)),
 			)
+		)
 
 	def warn_about_carry_forwarding(self):
 		if not self.carry_forward:
 			return
 
 		leave_types = get_leave_type_details()
-		leave_policy = frappe.get_doc("Leave Policy", self.leave_policy)
 
-		for policy in leave_policy.leave_policy_details:
-			leave_type = leave_types.get(policy.leave_type)
+		for policy_leave_type, _annual_allocation in get_leave_policy_details(self.leave_policy):
+			leave_type = leave_types.get(policy_leave_type)
 			if not leave_type.is_carry_forward:
 				msg = _(
 					"Leaves for the Leave Type {0} won't be carry-forwarded since carry-forwarding is disabled."
@@ -82,16 +88,14 @@ class LeavePolicyAssignment(Document):
 		else:
 			leave_allocations = {}
 			leave_type_details = get_leave_type_details()
+			date_of_joining = self.get_date_of_joining()
 
-			leave_policy = frappe.get_doc("Leave Policy", self.leave_policy)
-			date_of_joining = frappe.db.get_value("Employee", self.employee, "date_of_joining")
-
-			for leave_policy_detail in leave_policy.leave_policy_details:
-				leave_details = leave_type_details.get(leave_policy_detail.leave_type)
+			for leave_type, annual_allocation in get_leave_policy_details(self.leave_policy):
+				leave_details = leave_type_details.get(leave_type)
 
 				if not leave_details.is_lwp:
 					leave_allocation, new_leaves_allocated = self.create_leave_allocation(
-						leave_policy_detail.annual_allocation,
+						annual_allocation,
 						leave_details,
 						date_of_joining,
 					)
@@ -102,6 +106,17 @@ class LeavePolicyAssignment(Document):
 			self.db_set("leaves_allocated", 1)
 			return leave_allocations
 
+	def get_date_of_joining(self):
+		employee_details = self.get_prefetched_employee_details()
+		if employee_details:
+			return employee_details.date_of_joining
+
+		return frappe.db.get_value("Employee", self.employee, "date_of_joining")
+
+	def get_prefetched_employee_details(self):
+		# set by `create_assignment_for_multiple_employees` for the employees being assigned
+		return (frappe.flags.bulk_assignment_employee_details or {}).get(self.employee)
+
 	def create_leave_allocation(self, new_leaves_allocated, leave_details, date_of_joining):
 		# Creates leave allocation for the given employee in the provided leave period
 		carry_forward = self.carry_forward
@@ -122,18 +137,17 @@ class LeavePolicyAssignment(Document):
 				leave_policy_assignment=self.name,
 				leave_policy=self.leave_policy,
 				carry_forward=carry_forward,
+				docstatus=1,
 			)
 		)
-		allocation.save(ignore_permissions=True)
-		allocation.submit()
+		# inserting as submitted validates once instead of once for save and again for submit
+		allocation.insert(ignore_permissions=True)
 		return allocation.name, new_leaves_allocated
 
 	def get_new_leaves(self, new_leaves_allocated, leave_details, date_of_joining):
-		from frappe.model.meta import get_field_precision
-
-		precision = get_field_precision(
-			frappe.get_meta("Leave Allocation").get_field("new_leaves_allocated")
-		)
+		precision = get_new_leaves_allocated_precision()
+		# evaluated only while counting passed months for earned leaves
+		is_current_month_applicable = None
 
 		# Earned Leaves and Compensatory Leaves are allocated by scheduler, initially allocate 0
 		if leave_details.is_compensatory == 1:
@@ -144,38 +158,43 @@ class LeavePolicyAssignment(Document):
 				new_leaves_allocated = 0
 			else:
 				# get leaves for past months if assignment is based on Leave Period / Joining Date
+				is_current_month_applicable = is_earned_leave_applicable_for_current_month(
+					date_of_joining, leave_details.allocate_on_day
+				)
 				new_leaves_allocated = self.get_leaves_for_passed_months(
-					new_leaves_allocated, leave_details, date_of_joining
+					new_leaves_allocated, leave_details, date_of_joining, is_current_month_applicable
 				)
 
 		new_leaves_allocated = self.get_pro_rated_leaves(
-			date_of_joining, leave_details, new_leaves_allocated
+			date_of_joining, leave_details, new_leaves_allocated, is_current_month_applicable
 		)
 
 		return flt(new_leaves_allocated, precision)
 
-	def get_leaves_for_passed_months(self, new_leaves_allocated, leave_details, date_of_joining):
-		from hrms.hr.utils import get_monthly_earned_leave
-
-		current_date = frappe.flags.current_date or getdate()
-		if current_date > getdate(self.effective_to):
-			current_date = getdate(self.effective_to)
+	def get_leaves_for_passed_months(
+		self, new_leaves_allocated, leave_details, date_of_joining, is_current_month_applicable=None
+	):
+		date_of_joining = getdate(date_of_joining)
+		effective_to = getdate(self.effective_to)
 
-		from_date = getdate(self.effective_from)
-		if getdate(date_of_joining) > from_date:
-			from_date = getdate(date_of_joining)
+		if is_current_month_applicable is None:
+			is_current_month_applicable = is_earned_leave_applicable_for_current_month(
+				date_of_joining, leave_details.allocate_on_day
+			)
 
-		months_passed = 0
+		current_date = getdate(frappe.flags.current_date)
+		if current_date > effective_to:
+			current_date = effective_to
 
-		if current_date.year == from_date.year and current_date.month >= from_date.month:
-			months_passed = current_date.month - from_date.month
-			if is_earned_leave_applicable_for_current_month(date_of_joining, leave_details.allocate_on_day):
-				months_passed += 1
+		from_date = getdate(self.effective_from)
+		if date_of_joining > from_date:
+			from_date = date_of_joining
 
-		elif current_date.year > from_date.year:
-			months_passed = (12 - from_date.month) + current_date.month
-			if is_earned_leave_applicable_for_current_month(date_of_joining, leave_details.allocate_on_day):
-				months_passed += 1
+		months_passed = (current_date.year - from_date.year) * 12 + (
+			current_date.month - from_date.month
+		)
+		if months_passed >= 0 and is_current_month_applicable:
+			months_passed += 1
 
 		if months_passed > 0:
 			monthly_earned_leave = get_monthly_earned_leave(
@@ -189,20 +208,30 @@ class LeavePolicyAssignment(Document):
 
 		return new_leaves_allocated
 
-	def get_pro_rated_leaves(self, date_of_joining, leave_details, new_leaves_allocated):
+	def get_pro_rated_leaves(
+		self, date_of_joining, leave_details, new_leaves_allocated, is_current_month_applicable=None
+	):
 		"""
 		Calculates pro-rated leaves for the months passed
 		for employees joining after the beginning of the given leave period
 		"""
+		date_of_joining = getdate(date_of_joining)
+		effective_from = getdate(self.effective_from)
+
 		# no need to prorate if employee joined before the leave period
-		if not new_leaves_allocated or getdate(date_of_joining) <= getdate(self.effective_from):
+		if not new_leaves_allocated or date_of_joining <= effective_from:
 			return new_leaves_allocated
 
 		# for earned leave, pro-rata period ends on the last day of the month
-		date = getdate(frappe.flags.current_date) or getdate()
+		date = getdate(frappe.flags.current_date)
 
 		if leave_details.is_earned_leave:
-			if is_earned_leave_applicable_for_current_month(date_of_joining, leave_details.allocate_on_day):
+			if is_current_month_applicable is None:
+				is_current_month_applicable = is_earned_leave_applicable_for_current_month(
+					date_of_joining, leave_details.allocate_on_day
+				)
+
+			if is_current_month_applicable:
 				period_end_date = get_last_day(date)
 			else:
 				period_end_date = get_last_day(add_months(date, -1))
@@ -210,7 +239,7 @@ class LeavePolicyAssignment(Document):
 			period_end_date = self.effective_to
 
 		new_leaves_allocated = calculate_pro_rated_leaves(
-			new_leaves_allocated, date_of_joining, self.effective_from, period_end_date
+			new_leaves_allocated, date_of_joining, effective_from, period_end_date
 		)
 
 		# don't round earned leaves
@@ -220,25 +249,25 @@ class LeavePolicyAssignment(Document):
 		return new_leaves_allocated
 
 
-def calculate_pro_rated_leaves(leaves, date_of_joining, period_start_date, period_end_date):
-	precision = cint(frappe.db.get_single_value("System Settings", "float_precision", cache=True))
-	actual_period = date_diff(period_end_date, date_of_joining) + 1
-	complete_period = date_diff(period_end_date, period_start_date) + 1
-
-	leaves *= actual_period / complete_period
+def get_new_leaves_allocated_precision():
+	# computed once per request, `frappe.local` is reset between requests
+	if getattr(frappe.local, "new_leaves_allocated_precision", None) is None:
+		frappe.local.new_leaves_allocated_precision = get_field_precision(
+			frappe.get_meta("Leave Allocation").get_field("new_leaves_allocated")
+		)
 
-	return flt(leaves, precision)
+	return frappe.local.new_leaves_allocated_precision
 
 
 def is_earned_leave_applicable_for_current_month(date_of_joining, allocate_on_day):
-	date = getdate(frappe.flags.current_date) or getdate()
+	date = getdate(frappe.flags.current_date)
 
 	# If the date of assignment creation is >= the leave type's "Allocate On" date,
 	# then the current month should be considered
 	# because the employee is already entitled for the leave of that month
 	if (
 		(allocate_on_day == "Date of Joining" and date.day >= date_of_joining.day)
-		or (allocate_on_day == "First Day" and date >= get_first_day(date))
+		or allocate_on_day == "First Day"
 		or (allocate_on_day == "Last Day" and date == get_last_day(date))
 	):
 		return True
@@ -254,31 +283,147 @@ def create_assignment_for_multiple_employees(employees, data):
 	if isinstance(data, str):
 		data = frappe._dict(json.loads(data))
 
+	employee_details = get_bulk_assignment_employee_details(employees, data)
+	frappe.flags.bulk_assignment_employee_details = employee_details
+
 	docs_name = []
-	for employee in employees:
-		assignment = frappe.new_doc("Leave Policy Assignment")
-		assignment.employee = employee
-		assignment.assignment_based_on = data.assignment_based_on or None
-		assignment.leave_policy = data.leave_policy
-		assignment.effective_from = getdate(data.effective_from) or None
-		assignment.effective_to = getdate(data.effective_to) or None
-		assignment.leave_period = data.leave_period or None
-		assignment.carry_forward = data.carry_forward
-		assignment.save()
-		try:
-			assignment.submit()
-		except frappe.exceptions.ValidationError:
-			continue
-
-		frappe.db.commit()
-
-		docs_name.append(assignment.name)
+	try:
+		for employee in employees:
+			assignment = frappe.new_doc("Leave Policy Assignment")
+			assignment.employee = employee
+			assignment.assignment_based_on = data.assignment_based_on or None
+			assignment.leave_policy = data.leave_policy
+			assignment.effective_from = getdate(data.effective_from) or None
+			assignment.effective_to = getdate(data.effective_to) or None
+			assignment.leave_period = data.leave_period or None
+			assignment.carry_forward = data.carry_forward
+
+			# commits are batched, skip the employee and discard everything created for it on failure
+			frappe.db.savepoint("leave_policy_assignment")
+			try:
+				assignment.save()
+				assignment.submit()
+			except frappe.exceptions.ValidationError:
+				frappe.db.rollback(save_point="leave_policy_assignment")
+				continue
+
+			docs_name.append(assignment.name)
+			# catch repeated employees in the same batch
+			if employee in employee_details:
+				employee_details[employee].has_overlap = True
+
+			if len(docs_name) % BULK_ASSIGNMENT_COMMIT_BATCH_SIZE == 0:
+				frappe.db.commit()
+	finally:
+		frappe.flags.bulk_assignment_employee_details = None
+
+	frappe.db.commit()
 
 	return docs_name
 
 
+def get_bulk_assignment_employee_details(employees, data):
+	"""
+	Returns the date of joining of each employee and whether a submitted assignment
+	already overlaps the assignment period, fetched in a single query
+	"""
+	if not employees:
+		return {}
+
+	effective_from, effective_to = data.effective_from, data.effective_to
+	if data.assignment_based_on == "Leave Period":
+		effective_from, effective_to = frappe.db.get_value(
+			"Leave Period", data.leave_period, ["from_date", "to_date"]
+		) or (None, None)
+
+	if data.assignment_based_on == "Joining Date":
+		# assignment period starts on each employee's date of joining
+		from_date = "emp.date_of_joining"
+		check_overlap = bool(effective_to)
+	else:
+		from_date = "%(effective_from)s"
+		check_overlap = bool(effective_from and effective_to)
+
+	details = frappe.db.sql(
+		"""
+		select emp.name, emp.date_of_joining, count(lpa.name) as overlapping_assignments
+		from `tabEmployee` emp
+		left join `tabLeave Policy Assignment` lpa
+			on lpa.employee = emp.name
+			and lpa.docstatus = 1
+			and lpa.effective_to >= {from_date}
+			and lpa.effective_from <= %(effective_to)s
+		where emp.name in %(employees)s
+		group by emp.name, emp.date_of_joining
+	""".format(
+			from_date=from_date
+		),
+		{"employees": tuple(employees), "effective_from": effective_from, "effective_to": effective_to},
+		as_dict=True,
+	)
+
+	return {
+		d.name: frappe._dict(
+			date_of_joining=d.date_of_joining,
+			# overlaps are validated per employee if the period isn't known upfront
+			has_overlap=bool(d.overlapping_assignments) if check_overlap else None,
+		)
+		for d in details
+	}
+
+
+def get_leave_policy_details(leave_policy):
+	"""Returns (leave type, annual allocation) for each row of the Leave Policy"""
+	return frappe.cache().hget(
+		"hrms_leave_policy_details", leave_policy, lambda: _fetch_leave_policy_details(leave_policy)
+	)
+
+
+def clear_leave_policy_details_cache(leave_policy=None):
+	"""Clears cached rows of the given Leave Policy, or of all policies if none is given"""
+	_clear_leave_policy_details_cache(leave_policy)
+	# reads before the change is committed may cache the old rows again
+	frappe.db.after_commit.add(partial(_clear_leave_policy_details_cache, leave_policy))
+
+
+def _clear_leave_policy_details_cache(leave_policy=None):
+	if leave_policy:
+		frappe.cache().hdel("hrms_leave_policy_details", leave_policy)
+	else:
+		frappe.cache().delete_value("hrms_leave_policy_details")
+
+
+def clear_leave_details_cache():
+	# called via the `clear_cache` hook, e.g. on `bench clear-cache` after migrate
+	clear_leave_type_details_cache()
+	clear_leave_policy_details_cache()
+
+
+def _fetch_leave_policy_details(leave_policy):
+	return frappe.get_all(
+		"Leave Policy Detail",
+		filters={"parent": leave_policy, "parenttype": "Leave Policy"},
+		fields=["leave_type", "annual_allocation"],
+		order_by="idx",
+		as_list=True,
+	)
+
+
 def get_leave_type_details():
-	leave_type_details = frappe._dict()
+	return frappe.cache().hget("hrms_leave_type_details", "all", _fetch_leave_type_details)
+
+
+def clear_leave_type_details_cache():
+	_clear_leave_type_details_cache()
+	# reads before the change is committed may cache the old rows again
+	frappe.db.after_commit.add(_clear_leave_type_details_cache)
+
+
+def _clear_leave_type_details_cache():
+	frappe.cache().hdel("hrms_leave_type_details", "all")
+
+
+def _fetch_leave_type_details():
 	leave_types = frappe.get_all(
 		"Leave Type",
 		fields=[
@@ -293,6 +438,4 @@ def get_leave_type_details():
 			"rounding",
 		],
 	)
-	for d in leave_types:
-		leave_type_details.setdefault(d.name, d)
-	return leave_type_details
+	return frappe._dict({d.name: d for d in leave_types})
@@ -7,10 +7,17 @@ import frappe
 from frappe.tests.utils import FrappeTestCase
 from frappe.utils import get_first_day, getdate
 
-from hrms.hr.doctype.leave_application.test_leave_application import get_employee, get_leave_period
+from erpnext.setup.doctype.employee.test_employee import make_employee
+
+from hrms.hr.doctype.leave_application.test_leave_application import (
+	get_employee,
+	get_leave_period,
+	make_allocation_record,
+)
 from hrms.hr.doctype.leave_policy.test_leave_policy import create_leave_policy
 from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
 	create_assignment_for_multiple_employees,
+	get_bulk_assignment_employee_details,
 )
 
 test_dependencies = ["Employee"]
@@ -109,5 +116,198 @@ class TestLeavePolicyAssignment(FrappeTestCase):
 			0,
 		)
 
+	def test_bulk_assignment_rejects_overlapping_assignment(self):
+		leave_period = get_leave_period()
+		leave_policy = create_leave_policy()
+		leave_policy.submit()
+
+		self.employee.date_of_joining = get_first_day(leave_period.from_date)
+		self.employee.save()
+
+		data = frappe._dict(
+			{
+				"assignment_based_on": "Leave Period",
+				"leave_policy": leave_policy.name,
+				"leave_period": leave_period.name,
+			}
+		)
+		create_assignment_for_multiple_employees([self.employee.name], data)
+		self.assertEqual(create_assignment_for_multiple_employees([self.employee.name], data), [])
+
+		# period starts on the employee's date of joining, within the existing assignment
+		data = frappe._dict(
+			{
+				"assignment_based_on": "Joining Date",
+				"leave_policy": leave_policy.name,
+				"effective_to": leave_period.to_date,
+			}
+		)
+		self.assertEqual(create_assignment_for_multiple_employees([self.employee.name], data), [])
+
+		frappe.db.rollback()
+		self.assertEqual(frappe.db.count("Leave Policy Assignment", {"employee": self.employee.name}), 1)
+
+	def test_bulk_assignment_rejects_repeated_employee(self):
+		leave_period = get_leave_period()
+		leave_policy = create_leave_policy()
+		leave_policy.submit()
+
+		data = frappe._dict(
+			{
+				"assignment_based_on": "Leave Period",
+				"leave_policy": leave_policy.name,
+				"leave_period": leave_period.name,
+			}
+		)
+		leave_policy_assignments = create_assignment_for_multiple_employees(
+			[self.employee.name, self.employee.name], data
+		)
+		self.assertEqual(len(leave_policy_assignments), 1)
+
+		# only the first assignment is committed, the repeated one is skipped
+		frappe.db.rollback()
+		self.assertEqual(
+			frappe.db.get_all("Leave Policy Assignment", {"employee": self.employee.name}, pluck="name"),
+			leave_policy_assignments,
+		)
+		self.assertEqual(
+			frappe.db.count("Leave Policy Assignment", {"employee": self.employee.name, "docstatus": 1}),
+			1,
+		)
+
+	def test_overlap_validation_falls_back_for_employees_missing_from_bulk_details(self):
+		leave_period = get_leave_period()
+		leave_policy = create_leave_policy()
+		leave_policy.submit()
+
+		data = frappe._dict(
+			{
+				"assignment_based_on": "Leave Period",
+				"leave_policy": leave_policy.name,
+				"leave_period": leave_period.name,
+			}
+		)
+		create_assignment_for_multiple_employees([self.employee.name], data)
+
+		employee_details = get_bulk_assignment_employee_details(
+			[self.employee.name, "_T-Employee-Missing"], data
+		)
+		self.assertIn(self.employee.name, employee_details)
+		self.assertNotIn("_T-Employee-Missing", employee_details)
+
+		# an employee absent from the prefetched details is checked with its own query
+		frappe.flags.bulk_assignment_employee_details = {"_T-Employee-Missing": frappe._dict()}
+		try:
+			assignment = frappe.new_doc("Leave Policy Assignment")
+			assignment.employee = self.employee.name
+			assignment.assignment_based_on = "Leave Period"
+			assignment.leave_policy = leave_policy.name
+			assignment.leave_period = leave_period.name
+			self.assertRaises(frappe.ValidationError, assignment.save)
+		finally:
+			frappe.flags.bulk_assignment_employee_details = None
+
+		self.assertEqual(create_assignment_for_multiple_employees(["_T-Employee-Missing"], data), [])
+
+	def test_failed_submission_is_rolled_back_in_bulk_assignment(self):
+		leave_period = get_leave_period()
+		leave_policy = frappe.get_doc(
+			{
+				"doctype": "Leave Policy",
+				"title": "Test Leave Policy",
+				"leave_policy_details": [
+					{"leave_type": "_Test Leave Type", "annual_allocation": 10},
+					{"leave_type": "_Test Leave Type Encashment", "annual_allocation": 10},
+				],
+			}
+		)
+		leave_policy.submit()
+
+		self.employee.date_of_joining = get_first_day(leave_period.from_date)
+		self.employee.save()
+		other_employee = make_employee("test_lpa_rollback@example.com", company="_Test Company")
+
+		# existing allocation makes the second policy row's allocation fail on overlap
+		make_allocation_record(
+			employee=self.employee.name,
+			leave_type="_Test Leave Type Encashment",
+			from_date=leave_period.from_date,
+			to_date=leave_period.to_date,
+			leaves=5,
+		)
+
+		data = {
+			"assignment_based_on": "Leave Period",
+			"leave_policy": leave_policy.name,
+			"leave_period": leave_period.name,
+		}
+		leave_policy_assignments = create_assignment_for_multiple_employees(
+			[self.employee.name, other_employee], frappe._dict(data)
+		)
+
+		# allocation and ledger entry created for the first row before the failure are discarded
+		filters = {"employee": self.employee.name, "leave_type": "_Test Leave Type"}
+		self.assertFalse(frappe.db.exists("Leave Allocation", filters))
+		self.assertFalse(frappe.db.exists("Leave Ledger Entry", filters))
+		self.assertFalse(frappe.db.exists("Leave Policy Assignment", {"employee": self.employee.name}))
+
+		# remaining employees are assigned and committed
+		frappe.db.rollback()
+		self.assertEqual(len(leave_policy_assignments), 1)
+		self.assertEqual(
+			frappe.db.get_value("Leave Policy Assignment", leave_policy_assignments[0], "employee"),
+			other_employee,
+		)
+		self.assertEqual(
+			frappe.db.count(
+				"Leave Allocation",
+				{"leave_policy_assignment": leave_policy_assignments[0], "docstatus": 1},
+			),
+			2,
+		)
+
+	def test_failed_save_does_not_abort_bulk_assignment(self):
+		leave_period = get_leave_period()
+		leave_policy = create_leave_policy()
+		leave_policy.submit()
+
+		other_employee = make_employee("test_lpa_failed_save@example.com", company="_Test Company")
+		data = frappe._dict(
+			{
+				"assignment_based_on": "Leave Period",
+				"leave_policy": leave_policy.name,
+				"leave_period": leave_period.name,
+			}
+		)
+		create_assignment_for_multiple_employees([self.employee.name], data)
+
+		# overlap validation fails while saving the first employee's assignment
+		leave_policy_assignments = create_assignment_for_multiple_employees(
+			[self.employee.name, other_employee], data
+		)
+
+		frappe.db.rollback()
+		self.assertEqual(len(leave_policy_assignments), 1)
+		self.assertEqual(
+			frappe.db.get_value("Leave Policy Assignment", leave_policy_assignments[0], "employee"),
+			other_employee,
+		)
+		self.assertEqual(frappe.db.count("Leave Policy Assignment", {"employee": self.employee.name}), 1)
+
+	def test_earned_leaves_for_passed_months_spanning_multiple_years(self):
+		assignment = frappe.new_doc("Leave Policy Assignment")
+		assignment.effective_from = getdate("2020-01-01")
+		assignment.effective_to = getdate("2022-12-31")
+		leave_details = frappe._dict(
+			allocate_on_day="Last Day", earned_leave_frequency="Monthly", rounding="0.5"
+		)
+
+		frappe.flags.current_date = getdate("2022-03-15")
+		leaves = assignment.get_leaves_for_passed_months(12, leave_details, getdate("2020-01-01"))
+
+		# Jan 2020 to Feb 2022, 1 leave per month
+		self.assertEqual(leaves, 26)
+
 	def tearDown(self):
 		frappe.db.set_value("Employee", self.employee.name, "date_of_joining", self.original_doj)
+		frappe.flags.current_date = None
@@ -7,6 +7,11 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import today
 
+from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
+	clear_leave_policy_details_cache,
+	clear_leave_type_details_cache,
+)
+
 
 class LeaveType(Document):
 	def validate(self):
@@ -31,3 +36,14 @@ class LeaveType(Document):
 			self.fraction_of_daily_salary_per_leave < 0 or self.fraction_of_daily_salary_per_leave > 1
 		):
 			frappe.throw(_("The fraction of Daily Salary per Leave should be between 0 and 1"))
+
+	def on_update(self):
+		clear_leave_type_details_cache()
+
+	def on_trash(self):
+		clear_leave_type_details_cache()
+
+	def after_rename(self, old, new, merge=False):
+		clear_leave_type_details_cache()
+		# renaming updates the leave type in Leave Policy Detail rows directly
+		clear_leave_policy_details_cache()
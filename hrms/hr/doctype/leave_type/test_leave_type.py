@@ -2,10 +2,51 @@
 # License: GNU General Public License v3. See license.txt
 
 import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hrms.hr.doctype.leave_policy.test_leave_policy import create_leave_policy
+from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
+	get_leave_policy_details,
+	get_leave_type_details,
+)
 
 test_records = frappe.get_test_records("Leave Type")
 
 
+class TestLeaveType(FrappeTestCase):
+	def setUp(self):
+		frappe.delete_doc_if_exists("Leave Type", "_Test Leave Type Renamed", force=1)
+		self.leave_type = create_leave_type(leave_type_name="_Test Leave Type Cache")
+		self.leave_type.is_carry_forward = 0
+		self.leave_type.save()
+
+	def test_leave_type_details_cache_refreshes_on_save_and_rename(self):
+		self.assertFalse(get_leave_type_details()[self.leave_type.name].is_carry_forward)
+
+		self.leave_type.is_carry_forward = 1
+		self.leave_type.save()
+		self.assertTrue(get_leave_type_details()[self.leave_type.name].is_carry_forward)
+
+		frappe.rename_doc("Leave Type", self.leave_type.name, "_Test Leave Type Renamed", force=True)
+		leave_type_details = get_leave_type_details()
+		self.assertIn("_Test Leave Type Renamed", leave_type_details)
+		self.assertNotIn("_Test Leave Type Cache", leave_type_details)
+
+	def test_leave_policy_details_cache_refreshes_on_leave_type_rename(self):
+		leave_policy = create_leave_policy(leave_type=self.leave_type.name, annual_allocation=5)
+		leave_policy.submit()
+		self.assertEqual(
+			[tuple(d) for d in get_leave_policy_details(leave_policy.name)],
+			[("_Test Leave Type Cache", 5)],
+		)
+
+		frappe.rename_doc("Leave Type", self.leave_type.name, "_Test Leave Type Renamed", force=True)
+		self.assertEqual(
+			[tuple(d) for d in get_leave_policy_details(leave_policy.name)],
+			[("_Test Leave Type Renamed", 5)],
+		)
+
+
 def create_leave_type(**args):
 	args = frappe._dict(args)
 	if frappe.db.exists("Leave Type", args.leave_type_name):
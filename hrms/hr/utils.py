@@ -6,6 +6,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import (
 	add_days,
+	cint,
 	cstr,
 	flt,
 	format_datetime,
@@ -25,10 +26,6 @@ from erpnext.setup.doctype.employee.employee import (
 	get_holiday_list_for_employee,
 )
 
-from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
-	calculate_pro_rated_leaves,
-)
-
 
 class DuplicateDeclarationError(frappe.ValidationError):
 	pass
@@ -299,6 +296,7 @@ def allocate_earned_leaves():
 	"""Allocate earned leaves to Employees"""
 	e_leave_types = get_earned_leaves()
 	today = frappe.flags.current_date or getdate()
+	precision = cint(frappe.db.get_single_value("System Settings", "float_precision", cache=True))
 
 	for e_leave_type in e_leave_types:
 		leave_allocations = get_leave_allocations(today, e_leave_type.name)
@@ -330,10 +328,14 @@ def allocate_earned_leaves():
 			if check_effective_date(
 				from_date, today, e_leave_type.earned_leave_frequency, e_leave_type.allocate_on_day
 			):
-				update_previous_leave_allocation(allocation, annual_allocation, e_leave_type, date_of_joining)
+				update_previous_leave_allocation(
+					allocation, annual_allocation, e_leave_type, date_of_joining, precision
+				)
 
 
-def update_previous_leave_allocation(allocation, annual_allocation, e_leave_type, date_of_joining):
+def update_previous_leave_allocation(
+	allocation, annual_allocation, e_leave_type, date_of_joining, precision=None
+):
 	def _calculate_pro_rated_leaves(earned_leaves):
 		today_date = frappe.flags.current_date or getdate()
 		period_end_date = get_last_day(today_date)
@@ -341,7 +343,7 @@ def update_previous_leave_allocation(allocation, annual_allocation, e_leave_type
 
 		if period_start_date <= date_of_joining <= period_end_date:
 			return calculate_pro_rated_leaves(
-				earned_leaves, date_of_joining, period_start_date, period_end_date
+				earned_leaves, date_of_joining, period_start_date, period_end_date, precision
 			)
 		return earned_leaves
 
@@ -388,6 +390,22 @@ def get_monthly_earned_leave(annual_leaves, frequency, rounding):
 	return earned_leaves
 
 
+def calculate_pro_rated_leaves(
+	leaves, date_of_joining, period_start_date, period_end_date, precision=None
+):
+	# callers processing allocations in bulk can fetch the precision once and pass it
+	if precision is None:
+		precision = cint(frappe.db.get_single_value("System Settings", "float_precision", cache=True))
+
+	period_end_date = getdate(period_end_date)
+	actual_period = (period_end_date - getdate(date_of_joining)).days + 1
+	complete_period = (period_end_date - getdate(period_start_date)).days + 1
+
+	leaves *= actual_period / complete_period
+
+	return flt(leaves, precision)
+
+
 def is_earned_leave_already_allocated(allocation, annual_allocation):
 	from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import get_leave_type_details
 